@@ -7,36 +7,52 @@ Command line arguments:
 """
 
 from sys import argv
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use("Agg")  # Plots are only saved to file, also from the worker processes
 from spectacle import io, analyse
 
-# Get the data folder from the command line
-folder = io.path_from_input(argv)
-root = io.find_root_folder(folder)
 
-# Load Camera objects
-camera = io.load_camera(root)
-print(f"Loaded Camera object: {camera}")
+def plot_iso(ISO, mean, bayer_map, savefolder, xmin, xmax):
+    """
+    Make and save the histogram and map plots of the bias `mean` at a single
+    `ISO` value.
+    """
+    save_to_histogram = savefolder/f"bias_histogram_iso{ISO}.pdf"
+    save_to_maps = savefolder/f"bias_map_iso{ISO}.pdf"
 
-# Save location based on camera name
-savefolder = camera.filename_analysis("bias", makefolders=True)
+    analyse.plot_histogram_RGB(mean, bayer_map, xmin=xmin, xmax=xmax, xlabel="Bias (ADU)", saveto=save_to_histogram)
+    analyse.plot_gauss_maps(mean, bayer_map, colorbar_label="Bias (ADU)", separate_channels=False, downsample_factor=4, saveto=save_to_maps)
 
-# Load the data
-isos, means = io.load_means(folder, retrieve_value=io.split_iso)
-print("Loaded data")
+    return ISO
 
-# Print statistics at each ISO
-stats = analyse.statistics(means, prefix_column=isos, prefix_column_header="ISO")
-print(stats)
 
-# Range on the x axis for the histograms
-xmin, xmax = analyse.symmetric_percentiles(means, percent=0.001)
+if __name__ == "__main__":
+    # Get the data folder from the command line
+    folder = io.path_from_input(argv)
+    root = io.find_root_folder(folder)
 
-# Loop over the data and make plots at each ISO value
-for ISO, mean in zip(isos, means):
-    save_to_histogram = savefolder/f"bias_histogram_iso{ISO}.pdf"
-    save_to_maps = savefolder/f"bias_map_iso{ISO}.pdf"
+    # Load Camera objects
+    camera = io.load_camera(root)
+    print(f"Loaded Camera object: {camera}")
+
+    # Save location based on camera name
+    savefolder = camera.filename_analysis("bias", makefolders=True)
+
+    # Load the data
+    isos, means = io.load_means(folder, retrieve_value=io.split_iso)
+    print("Loaded data")
+
+    # Print statistics at each ISO
+    stats = analyse.statistics(means, prefix_column=isos, prefix_column_header="ISO")
+    print(stats)
 
-    camera.plot_histogram_RGB(mean, xmin=xmin, xmax=xmax, xlabel="Bias (ADU)", saveto=save_to_histogram)
-    camera.plot_gauss_maps(mean, colorbar_label="Bias (ADU)", saveto=save_to_maps)
+    # Range on the x axis for the histograms
+    xmin, xmax = analyse.symmetric_percentiles(means, percent=0.001)
 
-    print(f"Saved plots for ISO speed {ISO}")
+    # Make plots at each ISO value
+    # These are independent of each other, so they are made in parallel
+    with ProcessPoolExecutor() as executor:
+        for ISO in executor.map(plot_iso, isos, means, repeat(camera.bayer_map), repeat(savefolder), repeat(xmin), repeat(xmax)):
+            print(f"Saved plots for ISO speed {ISO}")
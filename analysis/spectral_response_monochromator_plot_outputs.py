@@ -3,10 +3,11 @@ Analyse the output files from `../calibration/spectral_response_monochromator.py
 This plots all the intermediate spectra generated by that script.
 
 Command line arguments:
-    * `folder`: folder containing monochromator intemediaries. These should be
-    NPY files generated using ../calibration/spectral_response_monochromator.py
-    By default, these will have been saved to
-    root/intermediaries/spectral_response/
+    * `folder`: folder containing monochromator intemediaries. This should
+    include the NPZ file generated using
+    ../calibration/spectral_response_monochromator.py
+    By default, this will have been saved to
+    root/intermediaries/spectral_response/monochromator_intermediaries.npz
 """
 
 import numpy as np
@@ -29,32 +30,34 @@ save_to_normalised = savefolder/"monochromator_normalised_spectra.pdf"
 save_to_final = savefolder/"monochromator_final_spectrum.pdf"
 save_to_SNR = savefolder/"monochromator_SNR.pdf"
 
-# Load the wavelength data
-wavelengths = np.load(folder/"monochromator_wavelengths.npy")
+# Load the intermediaries
+# The arrays in the NPZ file are only read from disk when they are accessed
+data = np.load(folder/"monochromator_intermediaries.npz")
+wavelengths = data["wavelengths"]
 
 # Load and plot the raw response curves
-raw_mean = np.load(folder/"monochromator_raw_means.npy")
-raw_stds = np.load(folder/"monochromator_raw_stds.npy")
+raw_mean = data["raw_means"]
+raw_stds = data["raw_stds"]
 
 spectral.plot_monochromator_curves(wavelengths, raw_mean, raw_stds, title=f"{camera.name}: Raw spectral curves", saveto=save_to_raw)
 print("Saved raw spectrum plot")
 
 # Load and plot the calibrated response curves
-calibrated_mean = np.load(folder/"monochromator_calibrated_means.npy")
-calibrated_stds = np.load(folder/"monochromator_calibrated_stds.npy")
+calibrated_mean = data["calibrated_means"]
+calibrated_stds = data["calibrated_stds"]
 
 spectral.plot_monochromator_curves(wavelengths, calibrated_mean, calibrated_stds, title=f"{camera.name}: Calibrated spectral curves", saveto=save_to_calibrated)
 print("Saved calibrated spectrum plot")
 
 # Load and plot the normalised response curves
-normalised_mean = np.load(folder/"monochromator_normalised_means.npy")
-normalised_stds = np.load(folder/"monochromator_normalised_stds.npy")
+normalised_mean = data["normalised_means"]
+normalised_stds = data["normalised_stds"]
 
 spectral.plot_monochromator_curves(wavelengths, normalised_mean, normalised_stds, title=f"{camera.name}: Normalised spectral curves", saveto=save_to_normalised)
 print("Saved normalised spectrum plot")
 
 # Load and plot the final resulting spectral response curves
-final_curves = np.load(folder/"monochromator_curve.npy")
+final_curves = data["final_curve"]
 # Arrays in [] so they can be looped over (a bit of a hacky solution)
 final_mean = [final_curves[1:5].T]
 final_stds = [final_curves[5:].T]
@@ -24,13 +24,25 @@ This script requires the following additional data:
 Command line arguments:
     * `file`: iSPEX spectrum (RAW image)
 
+Set the environment variable `ISPEX_PLOT=0` to run without showing any plots,
+for example when processing many images. The figures are then only saved.
+
 NOTE: May not function correctly due to changes to flat-fielding methods. This
 will be fixed with the general overhaul for iSPEX 2.
 """
 
+import os
 import numpy as np
+import matplotlib
+
+# Only show plots interactively if not running in batch mode
+show_plots = (os.environ.get("ISPEX_PLOT", "1") == "1")
+if not show_plots:
+    matplotlib.use("Agg")
+
 from matplotlib import pyplot as plt
 from sys import argv
+from concurrent.futures import ThreadPoolExecutor
 from spectacle import raw, plot, io, wavelength
 from spectacle.general import blackbody, RMS, gauss1d, curve_fit
 
@@ -42,6 +54,27 @@ root = io.find_root_folder(file)
 camera = io.load_camera(root)
 print(f"Loaded Camera object: {camera}")
 
+# In batch mode, figures are saved in a background thread. A single thread is
+# used, and each figure is closed in pyplot once it has been handed to it, so
+# no later plotting commands can draw into it.
+figure_saver = ThreadPoolExecutor(max_workers=1)
+figures_saving = []
+
+def finish_figure(saveto=None):
+    """
+    Save the current figure to `saveto` (if given) and show it, or, in batch
+    mode, save it in the background.
+    """
+    fig = plt.gcf()
+    if show_plots:
+        if saveto is not None:
+            fig.savefig(saveto)
+        plt.show()
+        plt.close(fig)
+    elif saveto is not None:
+        figures_saving.append(figure_saver.submit(fig.savefig, saveto))
+        plt.close(fig)
+
 # Load the SMARTS2 reference spectrum
 wvl, smartsz, smartsy, smartsx = np.loadtxt("reference_spectra/ispex.ext.txt", skiprows=1, unpack=True)
 
@@ -66,22 +99,16 @@ plt.plot(wvl, smartsx, c='r', label="SMARTS2 (Diffuse)")
 plt.plot(wvl, smartsx_smooth, c='b', label="SMARTS2 (smoothed)")
 plt.xlim(390, 700)
 plt.legend(loc="best")
-plt.savefig(root/"analysis/spectral_response/SMARTS_vs_BB.pdf")
-plt.show()
+finish_figure(root/"analysis/spectral_response/SMARTS_vs_BB.pdf")
 
-# Load the iSPEX wavelength solution
-coefficients = wavelength.load_coefficients(root/"intermediaries/spectral_response/ispex_wavelength_solution.npy")
+# Location of the iSPEX wavelength solution
+wavelength_solution = root/"intermediaries/spectral_response/ispex_wavelength_solution.npy"
 
 # Load the data
 img  = io.load_raw_file(file)
+colors = img.raw_colors  # rawpy creates this array anew on every access
 print("Loaded data")
 
-# Bias correction
-values = camera.correct_bias(img.raw_image.astype(np.float32))
-
-# Flat-field correction
-values = camera.correct_flatfield(values)
-
 # Spectrum edges
 xmin, xmax = 1900, 3500
 ymin_thin , ymax_thin  = 450, 800
@@ -90,28 +117,37 @@ ymin_thick, ymax_thick = 900, 1220
 thin_slit  = np.s_[ymin_thin :ymax_thin , xmin:xmax]
 thick_slit = np.s_[ymin_thick:ymax_thick, xmin:xmax]
 
-x = np.arange(xmin, xmax)
-y_thin = np.arange(ymin_thin, ymax_thin)
-y_thick = np.arange(ymin_thick, ymax_thick)
-
-image_thin   = values        [thin_slit ]
-colors_thin  = img.raw_colors[thin_slit ]
+def correct_region(region):
+    """
+    Apply a bias and flat-field correction to the data in a `region` of the
+    image. Only this region is converted to floating point numbers and
+    corrected, rather than the entire image. The conversion is done as part of
+    the bias subtraction, in a single pass.
+    """
+    values_region = camera.correct_bias(img.raw_image[region], selection=region, dtype=np.float32)
+    values_region = camera.correct_flatfield(values_region, selection=region)
+    return values_region
+
+image_thin   = correct_region(thin_slit )
+colors_thin  = colors[thin_slit ]
 RGBG_thin = raw.demosaick(colors_thin, image_thin)
-plot.show_RGBG(RGBG_thin)
+if show_plots:
+    plot.show_RGBG(RGBG_thin)
 
-image_thick  = values        [thick_slit]
-colors_thick = img.raw_colors[thick_slit]
+image_thick  = correct_region(thick_slit)
+colors_thick = colors[thick_slit]
 RGBG_thick = raw.demosaick(colors_thick, image_thick)
-plot.show_RGBG(RGBG_thick)
+if show_plots:
+    plot.show_RGBG(RGBG_thick)
 
 # Extract areas slightly above and below the spectrum for noise removal
 above_thin  = np.s_[350:360, xmin:xmax]
 below_thick = np.s_[1400:1410, xmin:xmax]
 
-values_above = values[above_thin]
-colors_above = img.raw_colors[above_thin]
-values_below = values[below_thick]
-colors_below = img.raw_colors[below_thick]
+values_above = correct_region(above_thin)
+colors_above = colors[above_thin]
+values_below = correct_region(below_thick)
+colors_below = colors[below_thick]
 RGBG_above = raw.demosaick(colors_above, values_above)
 RGBG_below = raw.demosaick(colors_below, values_below)
 above = RGBG_above.mean(axis=1)
@@ -121,11 +157,9 @@ below = RGBG_below.mean(axis=1)
 RGBG_thin -= above[:,np.newaxis,:]
 RGBG_thick -= below[:,np.newaxis,:]
 
-# Calculate the wavelength corresponding to each pixel
-wavelengths_thin  = wavelength.calculate_wavelengths(coefficients, x, y_thin)
-wavelengths_thick = wavelength.calculate_wavelengths(coefficients, x, y_thick)
-wavelengths_thin_RGBG = raw.demosaick(colors_thin, wavelengths_thin)
-wavelengths_thick_RGBG = raw.demosaick(colors_thick, wavelengths_thick)
+# Calculate the wavelength corresponding to each pixel, demosaicked
+wavelengths_thin_RGBG  = wavelength.load_wavelengths_split(wavelength_solution, xmin, xmax, ymin_thin , ymax_thin , colors_thin )
+wavelengths_thick_RGBG = wavelength.load_wavelengths_split(wavelength_solution, xmin, xmax, ymin_thick, ymax_thick, colors_thick)
 
 # Combine the data into a single spectrum per slit
 lambdarange, all_interpolated_thin  = wavelength.interpolate_multi(wavelengths_thin_RGBG , RGBG_thin )
@@ -167,13 +201,10 @@ def plot_spectral_response(wavelength, thin_spec, thick_spec, monochromator, tit
     plt.ylim(0, 1.02)
     plt.grid()
     plt.legend(loc="best")
-    if saveto is not None:
-        plt.savefig(saveto)
-    plt.show()
-    plt.close()
+    finish_figure(saveto)
 
 # Load the monochromator curve for comparison
-curves = np.load(root/"intermediaries/spectral_response/monochromator_curve.npy")
+curves = np.load(root/"intermediaries/spectral_response/monochromator_intermediaries.npz")["final_curve"]
 
 plot_spectral_response(wvl, stacked_thin, stacked_thick, curves, "Original", saveto=root/"analysis/spectral_response/ispex_original.pdf")
 
@@ -220,3 +251,9 @@ print("BB factors:", BB_factors)
 plot_spectral_response(wvl, SMARTS_fixed, BB_fixed, curves, title="Multiplied by constant", label_thin="SMARTS2", label_thick="black-body", saveto=root/"analysis/spectral_response/ispex_fixed.pdf")
 
 plot_spectral_response(wvl, SMARTS_trans, BB_trans, curves, label_thin="SMARTS2", label_thick="black-body", saveto=root/"analysis/spectral_response/spectral_responses_ispex.pdf")
+
+# Wait for any figures that are still being saved in the background
+for saving in figures_saving:
+    saving.result()
+figure_saver.shutdown()
+plt.close("all")
@@ -41,14 +41,7 @@ save_to_XYZ_matrix = camera.filename_calibration("RGB_to_XYZ_matrix.csv")
 
 # Save locations for intermediaries
 savefolder = camera.filename_intermediaries("spectral_response", makefolders=True)
-save_to_wavelengths = savefolder/"monochromator_wavelengths.npy"
-save_to_means = savefolder/"monochromator_raw_means.npy"
-save_to_stds = savefolder/"monochromator_raw_stds.npy"
-save_to_means_calibrated = savefolder/"monochromator_calibrated_means.npy"
-save_to_stds_calibrated = savefolder/"monochromator_calibrated_stds.npy"
-save_to_means_normalised = savefolder/"monochromator_normalised_means.npy"
-save_to_stds_normalised = savefolder/"monochromator_normalised_stds.npy"
-save_to_final_curve = savefolder/"monochromator_curve.npy"
+save_to_intermediaries = savefolder/"monochromator_intermediaries.npz"
 
 # Get the subfolders in the given data folder
 folders = io.find_subfolders(folder)
@@ -64,59 +57,53 @@ print("Loaded calibration data")
 
 # Combine the spectral data from each folder into the same format
 all_wavelengths = np.unique(np.concatenate(wavelengths))
-all_means = np.full((len(wavelengths), len(all_wavelengths), 4), np.nan)
-all_stds = all_means.copy()
+
+# The combined arrays have the RGBG2 channels on the first axis, so the data
+# for each channel are contiguous in memory: [channel, spectrum, wavelength]
+all_means = np.full((4, len(wavelengths), len(all_wavelengths)), np.nan)
+all_stds = np.full((4, len(wavelengths), len(all_wavelengths)), np.nan)
 
 # Add the data from the separate spectra into one big array
 # If a spectrum is missing a wavelength, keep that value NaN
 for i, (wvl, mean, std) in enumerate(zip(wavelengths, means, stds)):
     indices = np.searchsorted(all_wavelengths, wvl)
-    all_means[i][indices] = mean
-    all_stds[i][indices] = std
 
-# Save the raw curves to file
-np.save(save_to_wavelengths, all_wavelengths)
-np.save(save_to_means, all_means)
-np.save(save_to_stds, all_stds)
-print(f"Saved raw curves to {savefolder}")
+    # If the spectrum covers a contiguous range of wavelengths (the usual
+    # case), use a slice rather than indexing element by element
+    if len(indices) and np.all(np.diff(indices) == 1):
+        indices = np.s_[indices[0]:indices[-1]+1]
 
-# Calibrate the data
-# First, create a copy of the array to put the calibrated data into
-all_means_calibrated = np.full(all_means.shape, np.nan)
-all_stds_calibrated = all_means_calibrated.copy()
+    all_means[:, i, indices] = mean.T
+    all_stds[:, i, indices] = std.T
 
-# Loop over the spectra
-for i, (mean, std, cal) in enumerate(zip(all_means, all_stds, cals)):
+# Calibrate the data
+# First, put the calibration data on the same wavelength grid as the spectra
+# Wavelengths without calibration data are kept NaN, so the calibrated data
+# at those wavelengths will be NaN too
+cal_dense = np.full((1, len(cals), len(all_wavelengths)), np.nan)
+for i, cal in enumerate(cals):
     # Find the overlapping wavelengths between calibration and data
-    _, cal_indices, all_wavelengths_indices = np.intersect1d(cal[0], all_wavelengths, return_indices=True)
+    # Both are sorted, so a binary search is sufficient
+    indices = np.searchsorted(all_wavelengths, cal[0]).clip(max=len(all_wavelengths)-1)
+    overlap = (all_wavelengths[indices] == cal[0])
+    cal_dense[0, i, indices[overlap]] = cal[1, overlap]
 
-    # Calibrate the data and store it in the main array
-    all_means_calibrated[i, all_wavelengths_indices] = mean[all_wavelengths_indices] / cal[1, cal_indices, np.newaxis]
-
-    # Assume the error in the result is dominated by the error in the data,
-    # not in the calibration (strong assumption!) and propagate the error
-    all_stds_calibrated[i, all_wavelengths_indices] = std[all_wavelengths_indices] / cal[1, cal_indices, np.newaxis]
+# Calibrate the data
+all_means_calibrated = all_means / cal_dense
 
-# Save the calibrated curves to file
-np.save(save_to_means_calibrated, all_means_calibrated)
-np.save(save_to_stds_calibrated, all_stds_calibrated)
-print(f"Saved calibrated curves to {savefolder}")
+# Assume the error in the result is dominated by the error in the data,
+# not in the calibration (strong assumption!) and propagate the error
+all_stds_calibrated = all_stds / cal_dense
 
 # Normalise the calibrated data
 # Create a copy of the array to put the normalised data into
 all_means_normalised = all_means_calibrated.copy()
 all_stds_normalised = all_stds_calibrated.copy()
 
-def overlap(spectrum_a, spectrum_b):
-    """
-    Find the number of overlapping wavelengths between two spectra
-    """
-    summed = spectrum_a + spectrum_b
-    length = len(np.where(~np.isnan(summed))[0])
-    return length
-
-# Find the number of overlapping wavelengths
-all_overlaps = np.array([[overlap(mean1, mean2) for mean1 in all_means_calibrated] for mean2 in all_means_calibrated])
+# Find the number of overlapping wavelengths between each pair of spectra
+# This is the matrix product of the valid-data masks with themselves
+valid = (~np.isnan(all_means_calibrated[0])).astype(np.int32)
+all_overlaps = valid @ valid.T
 
 # Use the spectrum with the most overlap with itself (i.e. most data) as the
 # baseline to normalise others to
@@ -126,6 +113,9 @@ baseline = np.diag(all_overlaps).argmax()
 # -2 because there is no point in normalising the baseline (-1) by itself
 normalise_order = np.argsort(all_overlaps[baseline])[-2::-1]
 
+# Vandermonde matrix for evaluating the parabolic fits at all wavelengths
+vandermonde = np.vander(all_wavelengths, 3)
+
 # Loop over the spectra and normalise them by the data set with the largest overlap
 for i in normalise_order:
     # If there is any overlap with the baseline, normalise to that
@@ -139,63 +129,67 @@ for i in normalise_order:
         comparison = np.argsort(all_overlaps[i])[-2]
 
     # Calculate the ratio between this spectrum and the comparison one at each wavelength
-    ratios = all_means_calibrated[i] / all_means_normalised[comparison]
+    ratios = all_means_calibrated[:, i] / all_means_normalised[:, comparison]
     print(f"Normalising spectrum {i} to spectrum {comparison}")
 
     # Fit a parabolic function to the ratio between the spectra where they overlap
-    ind = ~np.isnan(ratios[:,0])
-    fits = np.polyfit(all_wavelengths[ind], ratios[ind], 2)
-    fit_norms = np.array([np.polyval(f, all_wavelengths) for f in fits.T]).T
+    ind = ~np.isnan(ratios[0])
+    fits = np.polyfit(all_wavelengths[ind], ratios[:, ind].T, 2)
+    fit_norms = (vandermonde @ fits).T
 
     # Normalise by dividing the spectrum by this parabola
-    all_means_normalised[i] = all_means_calibrated[i] / fit_norms
-    all_stds_normalised[i] = all_stds_calibrated[i] / fit_norms
-
-# Save the normalised curves to file
-np.save(save_to_means_normalised, all_means_normalised)
-np.save(save_to_stds_normalised, all_stds_normalised)
-print(f"Saved normalised curves to {savefolder}")
+    all_means_normalised[:, i] = all_means_calibrated[:, i] / fit_norms
+    all_stds_normalised[:, i] = all_stds_calibrated[:, i] / fit_norms
 
 # Combine the spectra into one
 # Calculate the signal-to-noise ratio (SNR) at each wavelength in each spectrum
 SNR = all_means_normalised / all_stds_normalised
 
-# Mask NaN data
-mean_mask = np.ma.array(all_means_normalised, mask=np.isnan(all_means_normalised))
-stds_mask = np.ma.array(all_stds_normalised , mask=np.isnan(all_stds_normalised ))
-SNR_mask  = np.ma.array(SNR                 , mask=np.isnan(SNR                 ))
-
 # Calculate the weight of each spectrum at each wavelength, based on the SNR
-weights = SNR_mask**2
+# NaN data are given zero weight, so they do not contribute to the average
+weights = np.where(np.isnan(SNR), 0., SNR)**2
+means_filled = np.where(np.isnan(all_means_normalised), 0., all_means_normalised)
+stds_filled = np.where(np.isnan(all_stds_normalised), 0., all_stds_normalised)
+weights_sum = weights.sum(axis=1, keepdims=True)
+
+# Wavelengths without data in any spectrum have a total weight of 0
+# The average (and its error) at these wavelengths is set to 0
+has_data = (weights_sum > 0)
+relative_weights = np.divide(weights, weights_sum, out=np.zeros_like(weights), where=has_data)
 
 # Calculate the weighted average (and its error) per wavelength
-flat_means_mask = np.ma.average(mean_mask, axis=0, weights=weights)
-flat_errs_mask = np.sqrt(np.ma.sum((weights/weights.sum(axis=0) * stds_mask)**2, axis=0))
+flat_means = (relative_weights * means_filled).sum(axis=1)
+flat_errs = np.sqrt(((relative_weights * stds_filled)**2).sum(axis=1))
 
 # Calculate the SNR of the resulting spectrum
-SNR_final = flat_means_mask / flat_errs_mask
+with np.errstate(invalid="ignore", divide="ignore"):
+    SNR_final = flat_means / flat_errs
+
+# Normalise the final data set
+response_normalised = flat_means / np.nanmax(flat_means)
+errors_normalised = flat_errs / np.nanmax(flat_means)
 
-# Remove the mask from the final data set
-response_normalised = (flat_means_mask / flat_means_mask.max()).data
-errors_normalised = (flat_errs_mask / flat_means_mask.max()).data
+# Combine the result into one big array
+result = np.array(np.stack([all_wavelengths, *response_normalised, *errors_normalised]))
 
-# Combine the result into one big array and save it
-result = np.array(np.stack([all_wavelengths, *response_normalised.T, *errors_normalised.T]))
-np.save(save_to_final_curve, result)
-print(f"Saved final curves to {savefolder}")
+# Save the intermediary and final curves to a single file
+# The intermediaries are saved as [spectrum, wavelength, channel] arrays
+channel_last = lambda data: np.moveaxis(data, 0, -1)
+np.savez(save_to_intermediaries, wavelengths=all_wavelengths, raw_means=channel_last(all_means), raw_stds=channel_last(all_stds), calibrated_means=channel_last(all_means_calibrated), calibrated_stds=channel_last(all_stds_calibrated), normalised_means=channel_last(all_means_normalised), normalised_stds=channel_last(all_stds_normalised), final_curve=result)
+print(f"Saved intermediary and final curves to '{save_to_intermediaries}'")
 
 np.savetxt(save_to_SRF, result.T, delimiter=",", header="Wavelength, R, G, B, G2, R_err, G_err, B_err, G2_err")
 print(f"Saved spectral response curves to '{save_to_SRF}'")
 
 # Calculate the effective spectral bandwidth of each channel and save those too
-bandwidths = spectral.effective_bandwidth(all_wavelengths, response_normalised, axis=0)
+bandwidths = spectral.effective_bandwidth(all_wavelengths, response_normalised.T, axis=0)
 np.savetxt(save_to_bands, bandwidths[:,np.newaxis].T, delimiter=", ", header="R, G, B, G2")
 print("Effective spectral bandwidths:")
 for band, width in zip(plot.RGBG2, bandwidths):
     print(f"{band:<2}: {width:5.1f} nm")
 
 # Calculate the RGB-to-XYZ matrix
-M_RGB_to_XYZ = spectral.calculate_XYZ_matrix(all_wavelengths, response_normalised.T)
+M_RGB_to_XYZ = spectral.calculate_XYZ_matrix(all_wavelengths, response_normalised)
 
 # Save the conversion matrix
 header = f"Matrix for converting {camera.name} RGB data to CIE XYZ, with an equal-energy illuminant (E).\n\
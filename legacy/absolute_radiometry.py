@@ -16,28 +16,32 @@ colours = camera.bayer_map
 iso = 23
 exposure_time = 1/3
 
+# The NPY files are memory-mapped, so only the clipped region used below is
+# read from disk
 try:
-    mean = np.load(meanfile)
+    mean = np.load(meanfile, mmap_mode="r")
 except OSError:
     mean = io.load_raw_image(meanfile)
 
-bias = np.load(products/"bias.npy")
-dark = np.load(products/"dark.npy")
+bias = np.load(products/"bias.npy", mmap_mode="r")
+dark = np.load(products/"dark.npy", mmap_mode="r")
 
-corrected_ADU = mean - bias - dark * exposure_time  # ADU
+# Clip the edges first, so the corrections below are only applied to the
+# pixels that are used, and do so in-place to avoid temporary arrays
+colours_edges = colours[flat.clip_border]
+corrected_flat = mean[flat.clip_border] - bias[flat.clip_border]
+corrected_flat -= dark[flat.clip_border] * exposure_time  # ADU
 print("Corrected for bias and dark current")
 
 ISO_model = io.read_iso_model(products)
 iso_normalization = ISO_model(iso)
 
-corrected_exposure = (phone["camera"]["f-number"]**2 / (exposure_time * iso_normalization) ) * corrected_ADU  # norm. ADU sr^-1 s^-1
+corrected_flat *= (phone["camera"]["f-number"]**2 / (exposure_time * iso_normalization) )  # norm. ADU sr^-1 s^-1
 print("Corrected for exposure parameters")
 
-corrected_edges = corrected_exposure[flat.clip_border]
-colours_edges = colours[flat.clip_border]
-flatfield_correction = io.load_flatfield_correction(root, corrected_edges.shape)
+flatfield_correction = io.load_flatfield_correction(root, corrected_flat.shape)
 
-corrected_flat = flatfield_correction * corrected_edges  # norm. ADU sr^-1 s^-1
+corrected_flat *= flatfield_correction  # norm. ADU sr^-1 s^-1
 print("Corrected for flat-field")
 
 pixel_area_m = (phone["camera"]["pixel_size"] * 1e-6)**2
@@ -44,29 +44,59 @@ def statistics(data, prefix_column=None, prefix_column_header=""):
     return table
 
 
-def plot_gauss_maps(data, bayer_data, kernel_width_RGBG2=5, **kwargs):
+def downsample(data, factor):
+    """
+    Downsample the last two (spatial) axes of `data` by a given `factor`, by
+    averaging blocks of `factor`x`factor` elements. Elements that do not fit
+    into a whole block are cut off.
+    """
+    ny, nx = data.shape[-2] // factor, data.shape[-1] // factor
+    data_cut = data[..., :ny*factor, :nx*factor]
+    data_blocks = data_cut.reshape(*data.shape[:-2], ny, factor, nx, factor)
+    data_downsampled = data_blocks.mean(axis=(-3, -1))
+    return data_downsampled
+
+
+def plot_gauss_maps(data, bayer_data, kernel_width_RGBG2=5, separate_channels=True, downsample_factor=1, **kwargs):
     """
     Plot maps of the `data`, convolved with a Gaussian kernel. Both the
     mosaicked data and demosaicked RGBG2 data are convolved and plotted.
     The kernel width is `kernel_width_RGBG2` for the RGBG2 data and
     `2*kernel_width_RGBG2` for the mosaicked data.
 
+    The RGBG2 data are always plotted together in one figure. If
+    `separate_channels` is True, each channel is also plotted separately.
+
+    If a `downsample_factor` greater than 1 is given, the data are downsampled
+    by that factor before the convolution, and the kernel widths shrunk
+    accordingly. This is much faster and barely changes the resulting maps,
+    since the convolution removes the small-scale structure anyway.
+
     Any additional **kwargs are passed to both `plot.show_image` and
     `plot.show_image_RGBG2`.
     """
     # Demosaick data by splitting the RGBG2 channels into separate arrays
     data_RGBG2 = raw.demosaick(bayer_data, data)
 
+    # Downsample the data and kernel widths if desired
+    # Blocks are averaged, rather than strided, so the downsampled mosaicked
+    # data still contain all the RGBG2 channels
+    kernel_width_mosaic = 2 * kernel_width_RGBG2
+    if downsample_factor > 1:
+        data = downsample(data, downsample_factor)
+        data_RGBG2 = downsample(data_RGBG2, downsample_factor)
+        kernel_width_mosaic = kernel_width_mosaic / downsample_factor
+        kernel_width_RGBG2 = kernel_width_RGBG2 / downsample_factor
+
     # Convolve the data with a Gaussian kernel
     # The two-dimensional mosaicked data are convolved over both axes
     # The three-dimensional demosaicked RGBG2 data are convolved over the two
     # spatial axes (1, 2), not the colour axis (0)
-    kernel_width_mosaic = 2 * kernel_width_RGBG2
     data_gaussed = gauss_filter_multidimensional(data, kernel_width_mosaic)
     data_RGBG2_gaussed = gauss_filter_multidimensional(data_RGBG2, (0, kernel_width_RGBG2, kernel_width_RGBG2))
 
     plot.show_image(data_gaussed, **kwargs)
-    plot.show_image_RGBG2(data_RGBG2_gaussed, **kwargs)
+    plot.show_image_RGBG2(data_RGBG2_gaussed, separate_channels=separate_channels, **kwargs)
 
 
 def plot_histogram_RGB(data, bayer_data, **kwargs):
@@ -41,11 +41,14 @@ def load_readnoise_map(root, return_filename=False):
     return return_with_filename(readnoise_map, filename, return_filename)
 
 
-def correct_bias_from_map(bias_map, data):
+def correct_bias_from_map(bias_map, data, dtype=None):
     """
     Apply a bias correction from a bias map `bias_map` to any number of
     elements in `data`
+
+    If a `dtype` is given, the result is calculated directly in that type, so
+    integer `data` do not need to be converted to floating point separately.
     """
-    data_corrected = data - bias_map
+    data_corrected = np.subtract(data, bias_map, dtype=dtype)
 
     return data_corrected
@@ -7,6 +7,7 @@ The Camera object also provides an easy interface for data calibration/correctio
 import numpy as np
 import json
 from collections import namedtuple
+from functools import lru_cache
 from pathlib import Path
 from os import makedirs
 
@@ -18,10 +19,12 @@ from .general import return_with_filename, find_matching_file
 all_data = np.s_[:]
 
 
-def find_root_folder(input_path):
+@lru_cache(maxsize=128)
+def _find_root_folder_cached(input_path):
     """
-    For a given `input_path`, find the root folder, containing the standard
-    sub-folders (calibration, analysis, stacks, etc.)
+    Find the root folder for a given folder `input_path` (str).
+    The results are cached, so repeated calls for the same folder (e.g. for all
+    images in it) do not have to search the file system again.
     """
     input_path = Path(input_path)
 
@@ -39,6 +42,22 @@ def find_root_folder(input_path):
     else:
         raise OSError(f"None of the parents of the input `{input_path}` include a camera data JSON file.")
 
+    return str(root)
+
+
+def find_root_folder(input_path):
+    """
+    For a given `input_path`, find the root folder, containing the standard
+    sub-folders (calibration, analysis, stacks, etc.)
+    """
+    input_path = Path(input_path).resolve()
+
+    # Files in the same folder have the same root folder, so look up the folder
+    # to make the cache work for all of them
+    if input_path.is_file():
+        input_path = input_path.parent
+
+    root = Path(_find_root_folder_cached(str(input_path)))
     return root
 
 
@@ -75,24 +94,13 @@ def _convert_exposure_time(exposure):
     """
     if isinstance(exposure, (float, int)):
         # If the input is already a number, simply return it
-        return exposure
+        return float(exposure)
     elif isinstance(exposure, str):
         # If the input is a string, e.g. from the command line
-        if "/" in exposure:
-            # If a fraction (e.g. '1/3', '2/5.1') is given, simply evaluate
-            # it and return the result
-            num, den = [float(x) for x in exposure.split("/")]
-            return num/den
-
-        elif "." in exposure:
-            # If a decimal number (e.g. '2.5' or '0.002') is given, simply
-            # convert it to a floating point number and return the result
-            return float(exposure)
-
-        else:
-            # If a simple number is given (e.g. '2' or '100'), simply convert
-            # it to a floating point number and return the result
-            return float(exposure)
+        # A fraction (e.g. '1/3', '2/5.1') is evaluated, while any other number
+        # (e.g. '2', '0.002') is simply converted to a floating point number
+        num, fraction, den = exposure.partition("/")
+        return float(num)/float(den) if fraction else float(num)
     else:
         # If the input is none of the above, try to cast it to a float somehow
         try:
@@ -137,7 +145,7 @@ class Camera(object):
         self.root = root
 
         # Generate/calculate commonly used values/properties
-        self.bayer_map = self._generate_bayer_map()
+        # The Bayer map is generated on first use, see Camera.bayer_map
         self.saturation = 2**self.bit_depth - 1
         self.bands = self.colour_description
 
@@ -185,13 +193,24 @@ class Camera(object):
         """
         Generate a Bayer map, with the Bayer channel (RGBG2) for each pixel.
         """
-        bayer_map = np.zeros(self.image_shape, dtype=int)
-        bayer_map[0::2, 0::2] = self.bayer_pattern[0][0]
-        bayer_map[0::2, 1::2] = self.bayer_pattern[0][1]
-        bayer_map[1::2, 0::2] = self.bayer_pattern[1][0]
-        bayer_map[1::2, 1::2] = self.bayer_pattern[1][1]
+        # Tile the 2x2 Bayer pattern over the image, cropping it in case the
+        # image has an odd number of rows or columns
+        bayer_pattern = np.asarray(self.bayer_pattern, dtype=np.int8)
+        nrows, ncols = self.image_shape
+        bayer_map = np.tile(bayer_pattern, ((nrows+1)//2, (ncols+1)//2))[:nrows, :ncols]
         return bayer_map
 
+    @property
+    def bayer_map(self):
+        """
+        Bayer map, with the Bayer channel (RGBG2) for each pixel.
+        This is generated on first use and then stored, so it need not be
+        re-generated in the future.
+        """
+        if not hasattr(self, "_bayer_map"):
+            self._bayer_map = self._generate_bayer_map()
+        return self._bayer_map
+
     def central_slice(self, dx, dy):
         """
         Generate a numpy slice object around the center of an image, with widths
@@ -219,10 +238,11 @@ class Camera(object):
         """
         Generate a Bayer-aware map of bias values from the camera information.
         """
-        bayer_map = self._generate_bayer_map()
-        for j, bias_value in enumerate(self.bias):
-            bayer_map[bayer_map == j] = bias_value
-        return bayer_map
+        # Use the Bayer map as an index into a look-up table of the
+        # per-channel bias values, so the image is only traversed once
+        bias_values = np.asarray(self.bias, dtype=np.float32)
+        bias_map = bias_values[self.bayer_map]
+        return bias_map
 
     def _load_bias_map(self):
         """
@@ -406,7 +426,7 @@ class Camera(object):
         data_available = [data_type for data_type in data_available if getattr(self, data_type) is not None]
         return data_available
 
-    def correct_bias(self, data, selection=all_data):
+    def correct_bias(self, data, selection=all_data, **kwargs):
         """
         Correct data for bias using this sensor's data.
         Bias data are loaded from the root folder or from the camera information.
@@ -419,7 +439,7 @@ class Camera(object):
         bias_map = self.bias_map[selection]
 
         # Apply the bias correction
-        data_corrected = bias_readnoise.correct_bias_from_map(bias_map, data)
+        data_corrected = bias_readnoise.correct_bias_from_map(bias_map, data, **kwargs)
         return data_corrected
 
     def correct_dark_current(self, exposure_time, data, selection=all_data):
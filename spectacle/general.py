@@ -16,12 +16,13 @@ def _gauss_nan(D, sigma=5, **kwargs):
     Apply a multidimensional Gaussian kernel, accounting for NaN values.
     Reference: https://stackoverflow.com/a/36307291/2229219
     """
-    V = D.copy()
-    V[D!=D] = 0
+    # Find the NaN values once and use them for both the data and the weights
+    nan = np.isnan(D)
+
+    V = np.where(nan, 0., D)
     VV = gaussMd(V, sigma=sigma, **kwargs)
 
-    W = 0 * D.copy() + 1
-    W[D!=D] = 0
+    W = (~nan).astype(float)
     WW = gaussMd(W, sigma=sigma, **kwargs)
 
     Z=VV/WW
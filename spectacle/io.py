@@ -3,6 +3,7 @@ import exifread
 import numpy as np
 import os
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib import pyplot as plt
 from .camera import load_camera, find_root_folder, load_json, write_json
 from .general import find_matching_file
@@ -26,6 +27,9 @@ def path_from_input(argv):
 def load_raw_file(filename):
     """
     Load a raw file using rawpy's `imread` function. Return the rawpy object.
+    Its `raw_colors` are re-created on every access, so store them if re-used.
+    Both `raw_image` and `raw_colors` include the margins (unlike
+    `raw_image_visible`/`raw_colors_visible`), matching the calibration maps.
     """
     # Convert filename to str because rawpy does not support Path
     filename_as_str = str(filename)
@@ -80,9 +84,16 @@ def load_raw_image_multi(folder, pattern="*.dng"):
     arrs[0] = file0.raw_image
 
     # Include the image data from the other files in the array
-    for j, file in enumerate(files[1:], 1):
+    # The files are independent, so they are loaded in parallel threads,
+    # each writing directly into the array; the decoding itself is done by
+    # LibRaw, outside of the Python interpreter
+    def load_into_array(j, file):
         arrs[j] = load_raw_image(file)
 
+    with ThreadPoolExecutor() as executor:
+        # Use list() to wait for all files and raise any errors that occurred
+        list(executor.map(load_into_array, range(1, len(files)), files[1:]))
+
     return arrs
 
 
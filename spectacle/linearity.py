@@ -151,23 +151,62 @@ def pearson_r_single(x, y, saturate):
     return r
 
 
-def calculate_pearson_r_values(x, y, **kwargs):
+def _pearson_r_block(x, y, saturate):
     """
-    Apply 'pearson_r_single' for every pixel in `y` (two-dimensional).
+    Calculate the Pearson r correlation between `x` and every pixel in `y`
+    (two-dimensional) using the closed-form expression for r, ignoring data
+    above the saturation limit `saturate`. Also return the number of
+    unsaturated data points for each pixel.
+    """
+    # Mask saturated data by giving them zero weight in the sums below
+    # The sums are calculated in double precision, because the differences
+    # between them in the expression for r are very small
+    unsaturated = (y < saturate)
+    y = np.where(unsaturated, y, 0.).astype(np.float64, copy=False)
+
+    # Sums over the unsaturated data for each pixel
+    n = unsaturated.sum(axis=0)
+    sum_x = np.tensordot(x, unsaturated, axes=1)
+    sum_xx = np.tensordot(x**2, unsaturated, axes=1)
+    sum_y = y.sum(axis=0)
+    sum_yy = np.einsum("ijk,ijk->jk", y, y)
+    sum_xy = np.tensordot(x, y, axes=1)
+
+    # Calculate r for each pixel
+    # Pixels with constant or insufficient data result in NaN values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (n*sum_xy - sum_x*sum_y) / np.sqrt((n*sum_xx - sum_x**2) * (n*sum_yy - sum_y**2))
+
+    # Remove any remaining rounding errors outside the range of r
+    r = np.clip(r, -1, 1)
+
+    return r, n
+
+
+def calculate_pearson_r_values(x, y, saturate, block_size=64):
+    """
+    Calculate the Pearson r correlation between `x` and every pixel in `y`
+    (two-dimensional), ignoring data above the saturation limit `saturate`.
+    This gives the same result as applying `pearson_r_single` to each pixel,
+    but evaluates the closed-form expression for r for many pixels at once,
+    in blocks of `block_size` rows to limit the memory use.
+
+    Pixels with fewer than two unsaturated data points are returned as NaN and
+    their indices listed in `saturated`.
 
     Use this for RAW data.
     """
-    saturated = []
-    r = np.zeros(y.shape[1:])
-    for i in range(y.shape[1]):
-        for j in range(y.shape[2]):
-            try:
-                r[i,j] = pearson_r_single(x, y[:,i,j], **kwargs)
-            except TypeError:  # if fully saturated
-                r[i,j] = np.nan
-                saturated.append((i,j))
-        if i%5 == 0:
-            print(f"{i/y.shape[1]*100:.1f}%", end=" ", flush=True)
+    x = np.asarray(x, dtype=float)
+    r = np.empty(y.shape[1:])
+    n = np.empty(y.shape[1:], dtype=int)
+    for i in range(0, y.shape[1], block_size):
+        r[i:i+block_size], n[i:i+block_size] = _pearson_r_block(x, y[:, i:i+block_size], saturate)
+        print(f"{i/y.shape[1]*100:.1f}%", end=" ", flush=True)
+
+    # Pixels that are (almost) fully saturated do not have a meaningful r
+    fully_saturated = (n < 2)
+    r[fully_saturated] = np.nan
+    saturated = list(zip(*np.where(fully_saturated)))
 
     return r, saturated
 
@@ -144,7 +144,11 @@ def show_image(data, colour=None, colorbar_label="", saveto=None, **kwargs):
     _saveshow(saveto)
 
 
-def show_image_RGBG2(data, saveto=None, vmin="auto", vmax="auto", **kwargs):
+def show_image_RGBG2(data, saveto=None, vmin="auto", vmax="auto", separate_channels=True, **kwargs):
+    """
+    Show/save images of RGBG2 `data`, all together in one figure and, if
+    `separate_channels` is True, also in a separate figure for each channel.
+    """
     # Default vmin and vmax if none are given by the user
     if vmin == "auto" or vmax == "auto":
         if vmin == "auto":
@@ -155,13 +159,14 @@ def show_image_RGBG2(data, saveto=None, vmin="auto", vmax="auto", **kwargs):
 
     saveto = _convert_to_path(saveto)
 
-    for j, c in enumerate(RGBG2):
-        try:
-            saveto_c = saveto.parent / (saveto.stem + "_" + c + saveto.suffix)
-        except AttributeError:
-            saveto_c = None
+    if separate_channels:
+        for j, c in enumerate(RGBG2):
+            try:
+                saveto_c = saveto.parent / (saveto.stem + "_" + c + saveto.suffix)
+            except AttributeError:
+                saveto_c = None
 
-        show_image(data[j], saveto=saveto_c, colour=c, **kwargs)
+            show_image(data[j], saveto=saveto_c, colour=c, **kwargs)
 
     try:
         saveto_RGBG2 = saveto.parent / (saveto.stem + "_RGBG2" + saveto.suffix)
@@ -1,5 +1,8 @@
 from astropy.stats import sigma_clip
 import numpy as np
+from functools import lru_cache
+from os.path import getmtime
+from . import raw
 
 """
 The spectacle.wavelength module will be moved to the ispex2 module, and will not be available in future releases.
@@ -62,10 +65,30 @@ def wavelength_fit(y, *coeff_coeff):
     return wavelength
 
 def calculate_wavelengths(coeff, x, y):
-    coeff_fit = np.array([np.polyval(c, y) for c in coeff]).T
-    wavelengths = np.array([np.polyval(c_fit, x) for c_fit in coeff_fit])
+    # Evaluate the polynomials for the wavelength coefficients at every y, and
+    # then the resulting wavelength relations at every x, as matrix products
+    # with Vandermonde matrices. The result has shape (len(y), len(x)).
+    x = np.asarray(x, dtype=np.float64) ; y = np.asarray(y, dtype=np.float64)
+    coeff_fit = np.vander(y, coeff.shape[1]) @ coeff.T
+    wavelengths = coeff_fit @ np.vander(x, coeff_fit.shape[1]).T
     return wavelengths
 
+def calculate_wavelengths_split(coeff, x, y, bayer_pattern):
+    """
+    Calculate the wavelength of each pixel on the grid `x`, `y`, split into the
+    RGBG2 channels like `raw.demosaick` would, using the 2x2 `bayer_pattern`
+    in the top-left corner of the grid.
+
+    The wavelengths only depend on the position of a pixel, not its colour, so
+    they are calculated on the sub-grid of each channel directly, rather than
+    on the full grid which is then demosaicked.
+    """
+    x = np.asarray(x) ; y = np.asarray(y)
+    nr_rows, nr_columns = len(y)//2, len(x)//2
+    slices = raw._generate_bayer_slices(np.asarray(bayer_pattern)[:2, :2])
+    wavelengths_split = np.stack([calculate_wavelengths(coeff, x[s[-1]][:nr_columns], y[s[-2]][:nr_rows]) for s in slices])
+    return wavelengths_split
+
 def interpolate_old(wavelengths, rgb, lambdarange):
     interpolated = np.vstack([np.interp(lambdarange, wavelengths, rgb[:,j]) for j in (0,1,2)]).T
     return interpolated
@@ -74,17 +97,97 @@ def interpolate(wavelength_array, color_value_array, lambdarange):
     interpolated = np.array([np.interp(lambdarange, wavelengths, color_values) for wavelengths, color_values in zip(wavelength_array, color_value_array)])
     return interpolated
 
+def precompute_resample(wavelengths_split, lambdarange):
+    """
+    Pre-compute the indices and weights for linearly interpolating data at
+    `wavelengths_split` (increasing along the last axis) to `lambdarange`.
+    These only depend on the wavelengths, so they can be re-used for any number
+    of images with the same wavelength solution, using `apply_resample`.
+    This is only faster than using np.interp directly if they are re-used.
+
+    Like np.interp, values outside the range of the data are set to the first
+    or last data value.
+    """
+    nr_columns = wavelengths_split.shape[-1]
+    rows = wavelengths_split.reshape(-1, nr_columns)
+
+    # Find the (fractional) column of each wavelength in `lambdarange`, in each row
+    columns = np.arange(nr_columns, dtype=np.float64)
+    positions = np.array([np.interp(lambdarange, row, columns) for row in rows])
+
+    # Split these into the data point to the left and the relative distance to
+    # the data point on the right
+    indices = np.floor(positions).astype(np.intp).clip(0, nr_columns-2)
+    weights = positions - indices
+
+    # Convert the indices to positions in the data with the channel and row
+    # axes flattened, so they can be used with np.take
+    indices += (np.arange(len(rows)) * nr_columns)[:, np.newaxis]
+
+    shape = (*wavelengths_split.shape[:-1], len(lambdarange))
+    return indices.reshape(shape), weights.reshape(shape)
+
+def apply_resample(data, indices, weights):
+    """
+    Linearly interpolate `data` using `indices` and `weights` from
+    `precompute_resample`. `data` must have the same shape as the wavelengths
+    these were calculated from, but may have additional leading axes, for
+    example for multiple images, which are all interpolated at once.
+    """
+    # Flatten the axes that the indices refer to
+    data = data.reshape(*data.shape[:data.ndim-indices.ndim], -1)
+
+    # Calculate left + weights * (right - left), in place where possible
+    data_left = np.take(data, indices, axis=-1)
+    interpolated = np.take(data, indices+1, axis=-1)
+    interpolated -= data_left
+    interpolated *= weights
+    interpolated += data_left
+    return interpolated
+
 def interpolate_multi(wavelengths_split, RGBG, lambdamin=390, lambdamax=700, lambdastep=1):
+    """
+    Interpolate the RGBG2 data `RGBG` on the wavelengths `wavelengths_split`
+    to a regular wavelength grid.
+
+    `RGBG` may contain multiple images with the same wavelengths, stacked along
+    an additional first axis. The interpolation indices and weights are then
+    calculated once and applied to all images at once.
+    """
     lambdarange = np.arange(lambdamin, lambdamax+lambdastep, lambdastep)
-    all_interpolated = np.array([interpolate(wavelengths_split[c], RGBG[c], lambdarange) for c in range(4)])
-    all_interpolated = np.moveaxis(all_interpolated, 2, 1)
+
+    # The data and wavelengths are both laid out as (channel, row, column), so
+    # each row is contiguous in memory along the axis that is interpolated
+    # This does not copy arrays that are already C-contiguous, like the output
+    # of raw.demosaick and calculate_wavelengths_split
+    wavelengths_split = np.ascontiguousarray(wavelengths_split)
+    RGBG = np.ascontiguousarray(RGBG)
+
+    # For a single image, interpolate every row of every channel directly into
+    # a pre-allocated array
+    if RGBG.ndim == wavelengths_split.ndim:
+        all_interpolated = np.empty((*RGBG.shape[:-1], len(lambdarange)))
+        for c, (wavelengths_c, RGBG_c) in enumerate(zip(wavelengths_split, RGBG)):
+            for r, (wavelengths_row, RGBG_row) in enumerate(zip(wavelengths_c, RGBG_c)):
+                all_interpolated[c, r] = np.interp(lambdarange, wavelengths_row, RGBG_row)
+    # For multiple images, re-use the interpolation indices and weights
+    else:
+        indices, weights = precompute_resample(wavelengths_split, lambdarange)
+        all_interpolated = apply_resample(RGBG, indices, weights)
+
+    # Return the data with shape (..., channel, wavelength, row), as a view
+    all_interpolated = np.moveaxis(all_interpolated, -1, -2)
     return lambdarange, all_interpolated
 
 def stack(wavelengths, interpolated):
-    stacked = interpolated.mean(axis=2)
-    stacked = np.roll(stacked, 1, axis=0)  # move to make space for wavelengths
-    stacked[2] = (stacked[0] + stacked[2])/2.  # G becomes mean of G
-    stacked[0] = wavelengths  # put wavelengths into array
+    # Write the wavelengths and the mean R, G, B along the rows directly into
+    # one array, instead of shifting the channels to make space afterwards
+    # Any additional leading axes (e.g. multiple images) are kept
+    stacked = np.empty((*interpolated.shape[:-3], 4, len(wavelengths)), dtype=interpolated.dtype)
+    stacked[..., 0, :] = wavelengths  # put wavelengths into array
+    interpolated[..., :3, :, :].mean(axis=-1, out=stacked[..., 1:, :])
+    stacked[..., 2, :] += interpolated[..., 3, :, :].mean(axis=-1)  # G becomes mean of G and G2
+    stacked[..., 2, :] /= 2.
     return stacked
 
 def per_wavelength(wavelengths_split, RGBG):
@@ -107,3 +210,25 @@ def save_coefficients(coefficients, saveto="wavelength.npy"):
 def load_coefficients(filename="wavelength.npy"):
     coefficients = np.load(filename)
     return coefficients
+
+@lru_cache(maxsize=4)
+def _load_wavelengths_split_cached(filename, modification_time, xmin, xmax, ymin, ymax, bayer_pattern):
+    coefficients = load_coefficients(filename)
+    x = np.arange(xmin, xmax) ; y = np.arange(ymin, ymax)
+    wavelengths_split = calculate_wavelengths_split(coefficients, x, y, bayer_pattern)
+    wavelengths_split.flags.writeable = False  # shared between callers
+    return wavelengths_split
+
+def load_wavelengths_split(filename, xmin, xmax, ymin, ymax, bayer_pattern):
+    """
+    Load the wavelength coefficients from `filename`, calculate the wavelength
+    of each pixel in the region [ymin:ymax, xmin:xmax], and demosaick these
+    according to the 2x2 `bayer_pattern` in the top-left corner of the region.
+
+    The results are cached, so repeated calls for the same region and an
+    unchanged coefficients file (e.g. for multiple images from the same phone)
+    do not have to calculate them again. The returned array is read-only.
+    """
+    filename = str(filename)
+    bayer_pattern = tuple(tuple(int(colour) for colour in row) for row in np.asarray(bayer_pattern)[:2, :2])
+    return _load_wavelengths_split_cached(filename, getmtime(filename), xmin, xmax, ymin, ymax, bayer_pattern)
@@ -80,9 +80,10 @@ wavelength.save_coefficients(coefficients, saveto=save_to)
 print(f"Saved wavelength coefficients to '{save_to}'")
 
 # Convert the input spectrum to wavelengths and plot it, as a sanity check
-wavelengths_cut = wavelength.calculate_wavelengths(coefficients, x, y)
-wavelengths_split,_ = raw.pull_apart(wavelengths_cut, colors_cut)
-RGBG,_ = raw.pull_apart(image_cut, colors_cut)
+# The wavelengths are calculated directly for each of the RGBG2 channels
+wavelengths_split = wavelength.calculate_wavelengths_split(coefficients, x, y, colors_cut)
+# Split the image into RGBG2 using strided slices along the Bayer pattern
+RGBG = raw.demosaick(colors_cut, image_cut)
 
 lambdarange, all_interpolated = wavelength.interpolate_multi(wavelengths_split, RGBG)
 